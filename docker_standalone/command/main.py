@@ -1,8 +1,10 @@
 import argparse
 import json
+import signal
 import sys
 
 from PythonChromiumHTML2PDF.print_to_pdf import print_to_pdf
+from PythonChromiumHTML2PDF.spool_worker import SpoolWorker
 
 
 CDP_LINK = 'https://chromedevtools.github.io/devtools-protocol/tot/Page/' \
@@ -17,17 +19,66 @@ def main(argv):
                              help='Input HTML file path')
     input_group.add_argument('-l', '--link', type=str,
                              help='Link to a HTML web page')
+    input_group.add_argument('-s', '--spool', type=str,
+                             help='Worker mode: process the jobs of this '
+                                  'spool directory')
 
     parser.add_argument('-t', '--target', type=str,
                         help='Output PDF file path')
 
-    parser.add_argument('-o', '--options', type=str, default='{}',
+    parser.add_argument('-o', '--options', type=str,
                         help=f'JSON print options (see {CDP_LINK})')
 
+    worker_group = parser.add_argument_group('worker mode options')
+    worker_group.add_argument('--worker-id', type=str,
+                              help='Worker name (default: <hostname>-<pid>)')
+    worker_group.add_argument('--port', type=int,
+                              help='Browser remote debugging port '
+                                   '(default: a free port)')
+    worker_group.add_argument('--lease-timeout', type=float,
+                              help='Seconds after which the job of an '
+                                   'unresponsive worker is requeued')
+    worker_group.add_argument('--exit-when-empty', action='store_true',
+                              help='Stop when there is no job left')
+
     args = parser.parse_args(argv)
 
+    worker_args = {'--worker-id': args.worker_id,
+                   '--port': args.port,
+                   '--lease-timeout': args.lease_timeout,
+                   '--exit-when-empty': args.exit_when_empty}
+    if args.spool:
+        if args.target or args.options:
+            parser.error('--target and --options cannot be used with '
+                         '--spool, they are given by each job')
+        worker = SpoolWorker(args.spool,
+                             worker_id=args.worker_id,
+                             port=args.port,
+                             lease_timeout=args.lease_timeout)
+        # finish the current job and stop the browser on `docker stop`,
+        # a second signal aborts immediately
+        previous_handlers = {
+            signum: signal.getsignal(signum) or signal.SIG_DFL
+            for signum in (signal.SIGTERM, signal.SIGINT)}
+
+        def stop_worker(signum, frame):
+            signal.signal(signum, previous_handlers[signum])
+            worker.stop()
+
+        for signum in previous_handlers:
+            signal.signal(signum, stop_worker)
+        try:
+            worker.run(exit_when_empty=args.exit_when_empty)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+        return
+    for arg, value in worker_args.items():
+        if value not in (None, False):
+            parser.error(f'{arg} can only be used with --spool')
+
     try:
-        print_config = json.loads(args.options)
+        print_config = json.loads(args.options or '{}')
         if args.file:
             print_config['input_html_path'] = args.file
         if args.link:
@@ -3,6 +3,7 @@ import os
 import json
 import tempfile
 
+from PythonChromiumHTML2PDF.spool_worker import submit_job
 from command.main import main
 
 
@@ -29,6 +30,18 @@ class TestMain(unittest.TestCase):
             main(args)
             self.assertTrue(os.path.isfile(temp_pdf_output_path))
 
+    def test_main_spool(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_pdf_output_path = os.path.join(temp_dir, 'output.pdf')
+            spool_dir = os.path.join(temp_dir, 'spool')
+            job_id = submit_job(spool_dir,
+                                input_url='http://example.org',
+                                output_pdf_path=temp_pdf_output_path)
+            main([f'--spool={spool_dir}', '--exit-when-empty'])
+            self.assertTrue(os.path.isfile(temp_pdf_output_path))
+            self.assertTrue(os.path.isfile(
+                os.path.join(spool_dir, 'done', f'{job_id}.json')))
+
     def test_main_input_args(self):
         with self.assertRaises(BaseException):
             main([
@@ -41,6 +54,17 @@ class TestMain(unittest.TestCase):
                 '--options={"marginRight": 0}'
             ])
 
+    def test_main_spool_input_args(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with self.assertRaises(SystemExit):
+                main([f'--spool={temp_dir}', '--target=output.pdf'])
+            with self.assertRaises(SystemExit):
+                main([f'--spool={temp_dir}', '--options={}'])
+        with self.assertRaises(SystemExit):
+            main(['--link=http://example.org', '--port=9223'])
+        with self.assertRaises(SystemExit):
+            main(['--link=http://example.org', '--exit-when-empty'])
+
     def test_main_wrong_json_args(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_pdf_output_path = os.path.join(temp_dir, 'output.pdf')
@@ -1,8 +1,10 @@
 """HTML to PDF converter using Chromium via the Chrome DevTools protocol"""
 
 __version__ = '0.1.0'
-__all__ = ['ChromeProcess', 'ChromeApi', 'ChromeApiCallback', 'print_to_pdf']
+__all__ = ['ChromeProcess', 'ChromeApi', 'ChromeApiCallback', 'print_to_pdf',
+           'SpoolWorker', 'submit_job']
 
 from PythonChromiumHTML2PDF.chrome_process import ChromeProcess
 from PythonChromiumHTML2PDF.chrome_api import ChromeApi, ChromeApiCallback
 from PythonChromiumHTML2PDF.print_to_pdf import print_to_pdf
+from PythonChromiumHTML2PDF.spool_worker import SpoolWorker, submit_job
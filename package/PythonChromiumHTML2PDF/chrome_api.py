@@ -192,6 +192,13 @@ class ChromeApi(ChromeInterface):
 
         return output_pdf_path
 
-    def get_chromium_logs(self) -> str:
-        with open(self.log_file, 'r') as f:
-            return f.read()
+    def get_chromium_logs_size(self) -> int:
+        return os.path.getsize(self.log_file)
+
+    def get_chromium_logs(self, start: int = 0) -> str:
+        """start: offset in bytes, e.g. a previous `get_chromium_logs_size()`
+        to only get the logs written since then
+        """
+        with open(self.log_file, 'rb') as f:
+            f.seek(start)
+            return f.read().decode('utf-8', errors='replace')
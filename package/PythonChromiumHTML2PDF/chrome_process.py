@@ -58,8 +58,14 @@ class ChromeProcess:
         self.log_file: IO = return_values[1]
         self.log_path: str = return_values[2]
         self.pid: int = self.chrome_process.pid
-        self.api: ChromeApi = self.connect_to_chrome(port, timeout)
+        self.api: Optional[ChromeApi] = None
         self.terminated = False
+        try:
+            self.api = self.connect_to_chrome(port, timeout)
+        except Exception:
+            # don't leave an orphan browser process and log file behind
+            self.terminate()
+            raise
 
     def __del__(self):
         try:
@@ -97,14 +103,16 @@ class ChromeProcess:
             *((self.HEADLESS_FLAGS + self.FONT_FLAGS) if flags is None
               else flags)
         ]
-        log_path = tempfile.mkstemp()[1]
-        log_file = open(log_path, 'w')
-        return (
-            subprocess.Popen(  # nosec: B603
-                cmd, stdout=log_file, stderr=log_file, shell=False),
-            log_file,
-            log_path
-        )
+        log_fd, log_path = tempfile.mkstemp()
+        log_file = os.fdopen(log_fd, 'w')
+        try:
+            process = subprocess.Popen(  # nosec: B603
+                cmd, stdout=log_file, stderr=log_file, shell=False)
+        except Exception:
+            log_file.close()
+            os.remove(log_path)
+            raise
+        return process, log_file, log_path
 
     def connect_to_chrome(self,
                           port: Optional[int] = None,
@@ -130,7 +138,8 @@ class ChromeProcess:
     def terminate(self):
         # first close the connection to the Chrome DevTools
         try:
-            self.api.close()
+            if self.api is not None:
+                self.api.close()
         except Exception as e:
             logger.exception(e)
 
@@ -3,6 +3,7 @@
 """
 
 import os
+from contextlib import nullcontext
 from typing import Optional
 import logging
 
@@ -37,6 +38,7 @@ def print_to_pdf(
     timeout: Optional[int] = None,
     callback: Optional[ChromeApiCallback] = None,
     screen_width: Optional[int] = None,
+    chrome_api: Optional[ChromeApi] = None,
     **print_options
 ) -> str:
     """
@@ -68,6 +70,10 @@ def print_to_pdf(
         If `screen_width` is passed alongside to `paperWidth`, `scale` will
         be automatically calculated to fit exactly `screen_width` pixels into
         the PDF page.
+    :param chrome_api:
+        already connected `ChromeApi` to reuse (e.g. from a running
+        `ChromeProcess`). If not provided, a new browser process is started
+        for this conversion and stopped afterwards, and `binary_path` is used.
     :param print_options:
         All the options that can be passed to CDP's Page.printToPDF(),
         see https://chromedevtools.github.io/devtools-protocol/tot/Page
@@ -85,7 +91,15 @@ def print_to_pdf(
         scale = page_width_inches/(screen_width/PAGE_DEFAULT_RESOLUTION)
         _print_options['scale'] = scale
 
-    with ChromeProcess(binary_path) as chrome_api:
+    if chrome_api is not None:
+        browser = nullcontext(chrome_api)
+        # the browser may have run other conversions: only report our logs
+        logs_start = chrome_api.get_chromium_logs_size()
+    else:
+        browser = ChromeProcess(binary_path)
+        logs_start = 0
+
+    with browser as chrome_api:
         chrome_api: ChromeApi
         try:
             _output_pdf_path = chrome_api.print_to_pdf(
@@ -100,6 +114,6 @@ def print_to_pdf(
                         f'at {os.path.abspath(_output_pdf_path)}')
             return _output_pdf_path
         except Exception:
-            logs = chrome_api.get_chromium_logs()
+            logs = chrome_api.get_chromium_logs(logs_start)
             logger.error(f'An error happened. Chromium logs:\n{logs}')
             raise
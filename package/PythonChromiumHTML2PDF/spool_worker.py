@@ -0,0 +1,410 @@
+"""Defines a `SpoolWorker` class that consumes conversion jobs from a spool
+directory, so that several workers (processes, containers, hosts sharing a
+volume) can share the conversion work using only the filesystem.
+
+Layout of the spool directory:
+    incoming/   jobs waiting to be processed (JSON files)
+    claimed/    jobs currently being processed by a worker
+    done/       results of the successful jobs, and their PDF by default
+    failed/     results of the failed jobs
+
+A job is a JSON object containing the keyword arguments of `print_to_pdf()`
+(except `binary_path`, `callback` and `chrome_api`). It is claimed by
+atomically renaming it from `incoming/` to `claimed/<job>.<claim token>`, so
+only one worker can get it, and a worker can always tell whether the claimed
+file is still its own. While processing a job, the worker keeps refreshing
+the modification time of the claimed file: this is its lease. Claimed jobs
+whose lease has not been refreshed for `lease_timeout` seconds (e.g. because
+their worker died) are moved back to `incoming/` by the other workers.
+
+Lease ages are measured with the clock of the spool filesystem (the current
+time is read from the mtime of a probe file each worker touches), so hosts
+sharing a network volume don't need synchronized clocks. Claimed files are
+opened before their mtime is read, which revalidates the NFS attribute
+cache; `lease_timeout` should still stay well above the attribute cache
+timeout of the mounts (`acregmax`, 60s by default).
+
+Jobs are processed at least once: a job can be processed twice if its lease
+expires while its worker is still alive, so outputs should be idempotent.
+"""
+from typing import Optional, List, Dict
+
+import os
+import json
+import socket
+import threading
+import time
+import traceback
+import uuid
+import logging
+
+from PythonChromiumHTML2PDF.chrome_process import ChromeProcess
+from PythonChromiumHTML2PDF.print_to_pdf import print_to_pdf
+
+
+logger = logging.getLogger(__name__)
+
+
+INCOMING_DIR = 'incoming'
+CLAIMED_DIR = 'claimed'
+DONE_DIR = 'done'
+FAILED_DIR = 'failed'
+SPOOL_DIRS = [INCOMING_DIR, CLAIMED_DIR, DONE_DIR, FAILED_DIR]
+
+JOB_EXTENSION = '.json'
+
+# errors raised by invalid job arguments, before the browser does anything:
+# they don't require restarting the browser
+JOB_ERRORS = (FileNotFoundError, ValueError, TypeError)
+
+
+def _write_json_atomically(path: str, content: Dict[str, object]):
+    # write next to the destination then rename, so that readers never see
+    # a partially written file. The '.tmp' suffix prevents workers from
+    # claiming it in the meantime.
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(content, f)
+    os.replace(tmp_path, path)
+
+
+def init_spool_dir(spool_dir: str):
+    for sub_dir in SPOOL_DIRS:
+        os.makedirs(os.path.join(spool_dir, sub_dir), exist_ok=True)
+
+
+def submit_job(spool_dir: str,
+               job_id: Optional[str] = None,
+               **job) -> str:
+    """Adds a job to the `incoming/` directory of the spool directory.
+
+    :param spool_dir:
+        path to the spool directory
+    :param job_id:
+        name of the job file. Defaults to a timestamp followed by a random
+        suffix, so that jobs are roughly processed in submission order.
+    :param job:
+        JSON-serializable keyword arguments of `print_to_pdf()`.
+        Relative `input_html_path` and `output_pdf_path` are resolved
+        against `spool_dir`, as workers may run in different directories or
+        on other hosts. `output_pdf_path` defaults to `done/<job_id>.pdf`.
+    :return:
+        the job id
+    """
+    init_spool_dir(spool_dir)
+    if job_id is None:
+        job_id = f'{time.time():.6f}-{uuid.uuid4().hex}'
+    _write_json_atomically(
+        os.path.join(spool_dir, INCOMING_DIR, job_id + JOB_EXTENSION), job)
+    return job_id
+
+
+def _get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def _job_name_from_claim(claim_name: str) -> str:
+    return claim_name.rsplit('.', 1)[0]
+
+
+def _get_mtime(path: str) -> float:
+    # opening the file revalidates its cached attributes on NFS
+    with open(path, 'rb') as f:
+        return os.fstat(f.fileno()).st_mtime
+
+
+class SpoolWorker:
+
+    DEFAULT_LEASE_TIMEOUT = 300  # seconds
+    DEFAULT_POLL_INTERVAL = 1  # seconds
+    DEFAULT_RETRY_INTERVAL = 10  # seconds
+
+    def __init__(self,
+                 spool_dir: str,
+                 worker_id: Optional[str] = None,
+                 binary_path: Optional[str] = None,
+                 port: Optional[int] = None,
+                 lease_timeout: Optional[float] = None,
+                 poll_interval: Optional[float] = None,
+                 retry_interval: Optional[float] = None):
+        """
+        :param spool_dir:
+            path to the spool directory, created if it doesn't exist
+        :param worker_id:
+            name of the worker written in the job results.
+            Defaults to '<hostname>-<pid>'.
+        :param binary_path:
+            path to the Chromium/Chrome browser binary, see `print_to_pdf()`
+        :param port:
+            remote debugging port of the browser.
+            Defaults to a free port picked each time the browser starts.
+        :param lease_timeout:
+            time in seconds after which a claimed job whose lease hasn't
+            been refreshed is considered abandoned and is requeued
+        :param poll_interval:
+            time in seconds to wait when there is no job to process
+        :param retry_interval:
+            time in seconds to wait after an error that is not caused by the
+            job itself, e.g. when the browser can't be started
+        """
+        self.spool_dir = spool_dir
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.binary_path = binary_path
+        self.port = port
+        self.lease_timeout = (lease_timeout if lease_timeout is not None
+                              else self.DEFAULT_LEASE_TIMEOUT)
+        self.poll_interval = (poll_interval if poll_interval is not None
+                              else self.DEFAULT_POLL_INTERVAL)
+        self.retry_interval = (retry_interval if retry_interval is not None
+                               else self.DEFAULT_RETRY_INTERVAL)
+        self.chrome_process: Optional[ChromeProcess] = None
+        self.stopped = threading.Event()
+        self.clock_path = os.path.join(spool_dir,
+                                       f'.clock-{uuid.uuid4().hex}')
+        init_spool_dir(spool_dir)
+
+    def __enter__(self) -> 'SpoolWorker':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop_browser()
+        self.remove_clock()
+
+    def _path(self, sub_dir: str, name: str = '') -> str:
+        return os.path.join(self.spool_dir, sub_dir, name)
+
+    def _list_jobs(self, sub_dir: str) -> List[str]:
+        return sorted(name for name in os.listdir(self._path(sub_dir))
+                      if name.endswith(JOB_EXTENSION))
+
+    def _list_claims(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self._path(CLAIMED_DIR))
+            if _job_name_from_claim(name).endswith(JOB_EXTENSION))
+
+    def start_browser(self):
+        if self.chrome_process is not None:
+            return
+        port = self.port if self.port is not None else _get_free_port()
+        chrome_process = ChromeProcess(self.binary_path, port)
+        # if the port was already in use, our browser couldn't listen on it
+        # and we are connected to another browser: never share its tabs
+        logs = chrome_process.api.get_chromium_logs()
+        if (chrome_process.chrome_process.poll() is not None
+                or f':{port}/devtools/browser/' not in logs):
+            chrome_process.terminate()
+            raise RuntimeError(
+                f'The browser started by worker {self.worker_id} is not '
+                f'listening on port {port}. Chromium logs:\n{logs}')
+        self.chrome_process = chrome_process
+
+    def stop_browser(self):
+        if self.chrome_process is not None:
+            self.chrome_process.terminate()
+            self.chrome_process = None
+
+    def get_spool_time(self) -> float:
+        """Current time according to the spool filesystem, which sets the
+        mtime of the leases."""
+        with open(self.clock_path, 'a'):
+            pass
+        os.utime(self.clock_path)
+        return _get_mtime(self.clock_path)
+
+    def remove_clock(self):
+        try:
+            os.remove(self.clock_path)
+        except FileNotFoundError:
+            pass
+
+    def requeue_expired_jobs(self) -> List[str]:
+        requeued = []
+        claim_names = self._list_claims()
+        if not claim_names:
+            return requeued
+        now = self.get_spool_time()
+        for claim_name in claim_names:
+            claimed_path = self._path(CLAIMED_DIR, claim_name)
+            job_name = _job_name_from_claim(claim_name)
+            try:
+                lease_age = now - _get_mtime(claimed_path)
+                if lease_age < self.lease_timeout:
+                    continue
+                os.rename(claimed_path, self._path(INCOMING_DIR, job_name))
+            except FileNotFoundError:
+                continue  # finished or requeued by another worker meanwhile
+            logger.warning(f'Requeued job {job_name} (lease expired '
+                           f'{lease_age - self.lease_timeout:.0f}s ago)')
+            requeued.append(job_name)
+        return requeued
+
+    def claim_job(self) -> Optional[str]:
+        """
+        :return:
+            the name of the claimed file in `claimed/`, or None if there was
+            no job to claim
+        """
+        for job_name in self._list_jobs(INCOMING_DIR):
+            incoming_path = self._path(INCOMING_DIR, job_name)
+            claim_name = f'{job_name}.{uuid.uuid4().hex}'
+            try:
+                # rename keeps the mtime: start the lease before, so that
+                # the claimed file is never seen with an expired lease
+                os.utime(incoming_path)
+                os.rename(incoming_path, self._path(CLAIMED_DIR, claim_name))
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            return claim_name
+        return None
+
+    def release_job(self, claim_name: str):
+        """Moves a claimed job back to `incoming/`."""
+        try:
+            os.rename(self._path(CLAIMED_DIR, claim_name),
+                      self._path(INCOMING_DIR,
+                                 _job_name_from_claim(claim_name)))
+        except FileNotFoundError:
+            logger.warning(f'Lost the claim {claim_name}')
+
+    def _renew_lease(self, claimed_path: str, done: threading.Event):
+        while not done.wait(self.lease_timeout / 4):
+            try:
+                os.utime(claimed_path)
+            except FileNotFoundError:
+                logger.warning(f'Lost the lease on {claimed_path}')
+                return
+
+    def _resolve_paths(self,
+                       job_name: str,
+                       job: Dict[str, object]) -> Dict[str, object]:
+        job = dict(job)
+        if job.get('input_html_path'):
+            job['input_html_path'] = os.path.abspath(
+                os.path.join(self.spool_dir, job['input_html_path']))
+        if not job.get('output_pdf_path'):
+            job_id = job_name[:-len(JOB_EXTENSION)]
+            job['output_pdf_path'] = os.path.join(DONE_DIR, f'{job_id}.pdf')
+        job['output_pdf_path'] = os.path.abspath(
+            os.path.join(self.spool_dir, job['output_pdf_path']))
+        return job
+
+    def _run_job(self,
+                 claim_name: str,
+                 job: Dict[str, object],
+                 result: Dict[str, object]) -> bool:
+        claimed_path = self._path(CLAIMED_DIR, claim_name)
+        lease_done = threading.Event()
+        lease_thread = threading.Thread(
+            target=self._renew_lease, args=(claimed_path, lease_done),
+            daemon=True)
+        lease_thread.start()
+        try:
+            result['output_pdf_path'] = print_to_pdf(
+                chrome_api=self.chrome_process.api,
+                **self._resolve_paths(_job_name_from_claim(claim_name), job))
+            return True
+        except Exception as e:
+            logger.exception(
+                f'Job {_job_name_from_claim(claim_name)} failed')
+            result['error'] = f'{e.__class__.__name__}: {e}'
+            result['traceback'] = traceback.format_exc()
+            if not isinstance(e, JOB_ERRORS):
+                # the browser may be in a bad state: restart it for next job
+                self.stop_browser()
+            return False
+        finally:
+            lease_done.set()
+            lease_thread.join()
+
+    def process_job(self, claim_name: str) -> Optional[bool]:
+        """Runs a claimed job and moves it to `done/` or `failed/`.
+
+        If the browser can't be started, the job is put back to `incoming/`
+        and the error is raised.
+
+        :return:
+            True if the job succeeded, False if it failed, None if the claim
+            was lost (the job was requeued) and no result was written
+        """
+        claimed_path = self._path(CLAIMED_DIR, claim_name)
+        job_name = _job_name_from_claim(claim_name)
+        result = dict(worker_id=self.worker_id, started_at=time.time())
+        try:
+            with open(claimed_path, 'r') as f:
+                job = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f'Job {job_name} was requeued before running')
+            return None
+        except ValueError as e:
+            result['error'] = f'Invalid job file: {e}'
+            succeeded = False
+        else:
+            result['job'] = job
+            try:
+                self.start_browser()
+            except Exception:
+                self.release_job(claim_name)
+                raise
+            succeeded = self._run_job(claim_name, job, result)
+        result['finished_at'] = time.time()
+
+        # take the claimed file out of reach of the other workers before
+        # writing the result, so that a requeued job never gets one
+        result_dir = DONE_DIR if succeeded else FAILED_DIR
+        finishing_path = self._path(result_dir, f'{claim_name}.tmp')
+        try:
+            os.rename(claimed_path, finishing_path)
+        except FileNotFoundError:
+            logger.warning(f'Job {job_name} was requeued while running, '
+                           f'discarding its result')
+            return None
+        _write_json_atomically(self._path(result_dir, job_name), result)
+        os.remove(finishing_path)
+        return succeeded
+
+    def run_once(self) -> Optional[str]:
+        """Requeues the abandoned jobs then processes one job if any.
+
+        :return:
+            the name of the processed job, or None if there was no job
+        """
+        self.requeue_expired_jobs()
+        claim_name = self.claim_job()
+        if claim_name is None:
+            return None
+        self.process_job(claim_name)
+        return _job_name_from_claim(claim_name)
+
+    def run(self, exit_when_empty: bool = False):
+        """Processes jobs until `stop()` is called, keeping the browser
+        running between jobs.
+
+        :param exit_when_empty:
+            return as soon as there is no job left in `incoming/`
+        """
+        logger.info(f'Worker {self.worker_id} processing jobs from '
+                    f'{os.path.abspath(self.spool_dir)}')
+        try:
+            while not self.stopped.is_set():
+                try:
+                    job_name = self.run_once()
+                except Exception:
+                    logger.exception(
+                        f'Worker {self.worker_id} error, retrying in '
+                        f'{self.retry_interval}s')
+                    self.stopped.wait(self.retry_interval)
+                    continue
+                if job_name is None:
+                    if exit_when_empty:
+                        break
+                    self.stopped.wait(self.poll_interval)
+        finally:
+            self.stop_browser()
+            self.remove_clock()
+
+    def stop(self):
+        """Stops `run()` after the current job. Can be called from a signal
+        handler or another thread."""
+        self.stopped.set()
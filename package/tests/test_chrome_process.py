@@ -71,3 +71,28 @@ class TestPrintToPDF(unittest.TestCase):
             self.assertTrue(chrome_api.wait_for_selector('#mock') > 1)
             with self.assertRaises(ValueError):
                 chrome_api.wait_for_selector('#nope')
+
+    def test_start_failure_cleanup(self):
+        temp_dir = tempfile.gettempdir()
+        temp_files = set(os.listdir(temp_dir))
+
+        # the binary doesn't exist
+        with self.assertRaises(FileNotFoundError):
+            ChromeProcess('/nonexistent/chromium')
+        self.assertEqual(set(os.listdir(temp_dir)), temp_files)
+
+        # the process starts but never accepts a connection
+        with tempfile.TemporaryDirectory() as script_dir:
+            script = os.path.join(script_dir, 'fake_chromium')
+            pid_file = os.path.join(script_dir, 'pid')
+            with open(script, 'w') as f:
+                f.write(f'#!/bin/sh\necho $$ > {pid_file}\nexec sleep 60\n')
+            os.chmod(script, 0o755)
+            temp_files = set(os.listdir(temp_dir))
+            with self.assertRaises(Exception):
+                ChromeProcess(script, timeout=1)
+            self.assertEqual(set(os.listdir(temp_dir)), temp_files)
+            with open(pid_file) as f:
+                pid = int(f.read())
+            with self.assertRaises(ProcessLookupError):
+                os.kill(pid, 0)
@@ -0,0 +1,263 @@
+import unittest
+import os
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from PythonChromiumHTML2PDF.spool_worker import SpoolWorker, submit_job
+
+
+class TestSpoolWorker(unittest.TestCase):
+    """Assumes a Chrome/Chromium browser is installed"""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.spool_dir = os.path.join(self.temp_dir.name, 'spool')
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _write_html(self, name: str) -> str:
+        html_path = os.path.join(self.temp_dir.name, name)
+        with open(html_path, 'w') as html:
+            html.write('<html><body>Hello World</body></html>')
+        return html_path
+
+    def _list(self, sub_dir: str):
+        return sorted(os.listdir(os.path.join(self.spool_dir, sub_dir)))
+
+    def _expire(self, sub_dir: str, name: str, age: float = 20):
+        path = os.path.join(self.spool_dir, sub_dir, name)
+        old_time = time.time() - age
+        os.utime(path, (old_time, old_time))
+
+    def _read_result(self, sub_dir: str, job_id: str):
+        with open(os.path.join(self.spool_dir, sub_dir,
+                               f'{job_id}.json')) as f:
+            return json.load(f)
+
+    def _mock_browser_worker(self, **kwargs) -> SpoolWorker:
+        worker = SpoolWorker(self.spool_dir, **kwargs)
+        worker.chrome_process = mock.Mock()
+        return worker
+
+    def test_claim_job(self):
+        job_id = submit_job(self.spool_dir, input_url='http://example.org')
+        self.assertEqual(self._list('incoming'), [f'{job_id}.json'])
+
+        worker_1 = SpoolWorker(self.spool_dir)
+        worker_2 = SpoolWorker(self.spool_dir)
+        claim_name = worker_1.claim_job()
+        self.assertTrue(claim_name.startswith(f'{job_id}.json.'))
+        self.assertIsNone(worker_2.claim_job())
+        self.assertEqual(self._list('incoming'), [])
+        self.assertEqual(self._list('claimed'), [claim_name])
+
+    def test_claim_old_job(self):
+        job_id = submit_job(self.spool_dir, input_url='http://example.org')
+        # the job waited in incoming/ for longer than the lease timeout
+        self._expire('incoming', f'{job_id}.json')
+        worker = SpoolWorker(self.spool_dir, lease_timeout=10)
+        claim_name = worker.claim_job()
+        self.assertEqual(worker.requeue_expired_jobs(), [])
+        self.assertEqual(self._list('claimed'), [claim_name])
+
+    def test_requeue_expired_jobs(self):
+        job_id = submit_job(self.spool_dir, input_url='http://example.org')
+        worker = SpoolWorker(self.spool_dir, lease_timeout=10)
+        claim_name = worker.claim_job()
+
+        # the lease is still valid
+        self.assertEqual(worker.requeue_expired_jobs(), [])
+        self.assertEqual(self._list('claimed'), [claim_name])
+
+        # simulate a worker that died 20 seconds ago
+        self._expire('claimed', claim_name)
+        self.assertEqual(worker.requeue_expired_jobs(), [f'{job_id}.json'])
+        self.assertEqual(self._list('claimed'), [])
+        self.assertEqual(self._list('incoming'), [f'{job_id}.json'])
+
+    def test_renew_lease(self):
+        submit_job(self.spool_dir, input_url='http://example.org')
+        worker = SpoolWorker(self.spool_dir, lease_timeout=0.4)
+        claim_name = worker.claim_job()
+        claimed_path = os.path.join(self.spool_dir, 'claimed', claim_name)
+        self._expire('claimed', claim_name)
+
+        done = threading.Event()
+        lease_thread = threading.Thread(target=worker._renew_lease,
+                                        args=(claimed_path, done))
+        lease_thread.start()
+        time.sleep(0.3)
+        self.assertLess(time.time() - os.path.getmtime(claimed_path), 0.4)
+        self.assertEqual(worker.requeue_expired_jobs(), [])
+
+        # the thread stops by itself once the claim is lost
+        os.remove(claimed_path)
+        lease_thread.join(timeout=1)
+        self.assertFalse(lease_thread.is_alive())
+        done.set()
+
+    def test_process_requeued_job(self):
+        job_id = submit_job(self.spool_dir, input_url='http://example.org')
+        worker_1 = SpoolWorker(self.spool_dir, lease_timeout=10)
+        worker_2 = SpoolWorker(self.spool_dir, lease_timeout=10)
+        claim_1 = worker_1.claim_job()
+
+        # worker_1 stalled: worker_2 requeues then claims its job
+        self._expire('claimed', claim_1)
+        worker_2.requeue_expired_jobs()
+        claim_2 = worker_2.claim_job()
+        self.assertNotEqual(claim_1, claim_2)
+
+        self.assertIsNone(worker_1.process_job(claim_1))
+        self.assertEqual(self._list('claimed'), [claim_2])
+        self.assertEqual(self._list('done'), [])
+        self.assertEqual(self._list('failed'), [])
+
+        # worker_2 gets back to it later
+        worker_2.release_job(claim_2)
+        self.assertEqual(self._list('incoming'), [f'{job_id}.json'])
+
+    def test_browser_error(self):
+        job_id = submit_job(self.spool_dir, input_url='http://example.org')
+        worker = SpoolWorker(self.spool_dir,
+                             binary_path='/nonexistent/chromium')
+        with self.assertRaises(Exception):
+            worker.run_once()
+        # the job is not failed, it waits for a working browser
+        self.assertEqual(self._list('incoming'), [f'{job_id}.json'])
+        self.assertEqual(self._list('claimed'), [])
+        self.assertEqual(self._list('failed'), [])
+
+    def test_get_spool_time(self):
+        with SpoolWorker(self.spool_dir) as worker:
+            self.assertAlmostEqual(worker.get_spool_time(), time.time(),
+                                   delta=1)
+        self.assertFalse(os.path.exists(worker.clock_path))
+
+    def test_process_job_requeued_while_running(self):
+        job_id = submit_job(self.spool_dir, input_url='http://example.org')
+        worker_1 = self._mock_browser_worker(lease_timeout=10)
+        worker_2 = SpoolWorker(self.spool_dir, lease_timeout=10)
+        claim_name = worker_1.claim_job()
+
+        def stalled_print_to_pdf(**kwargs):
+            # worker_1 takes so long that worker_2 requeues its job
+            self._expire('claimed', claim_name)
+            worker_2.requeue_expired_jobs()
+            return kwargs['output_pdf_path']
+
+        with mock.patch(
+                'PythonChromiumHTML2PDF.spool_worker.print_to_pdf',
+                side_effect=stalled_print_to_pdf):
+            self.assertIsNone(worker_1.process_job(claim_name))
+        self.assertEqual(self._list('incoming'), [f'{job_id}.json'])
+        self.assertEqual(self._list('claimed'), [])
+        self.assertEqual(self._list('done'), [])
+        self.assertEqual(self._list('failed'), [])
+
+    def test_job_paths(self):
+        os.makedirs(os.path.join(self.spool_dir, 'pages'))
+        job_id = submit_job(self.spool_dir,
+                            input_html_path='pages/page.html')
+        worker = self._mock_browser_worker()
+        with mock.patch(
+                'PythonChromiumHTML2PDF.spool_worker.print_to_pdf',
+                side_effect=lambda **kwargs: kwargs['output_pdf_path']
+        ) as mock_print_to_pdf:
+            self.assertTrue(worker.process_job(worker.claim_job()))
+
+        spool_dir = os.path.abspath(self.spool_dir)
+        kwargs = mock_print_to_pdf.call_args[1]
+        self.assertEqual(kwargs['input_html_path'],
+                         os.path.join(spool_dir, 'pages', 'page.html'))
+        self.assertEqual(kwargs['output_pdf_path'],
+                         os.path.join(spool_dir, 'done', f'{job_id}.pdf'))
+        result = self._read_result('done', job_id)
+        self.assertEqual(result['output_pdf_path'], kwargs['output_pdf_path'])
+        self.assertEqual(result['job'],
+                         dict(input_html_path='pages/page.html'))
+
+    def test_browser_restart(self):
+        worker = self._mock_browser_worker()
+        chrome_process = worker.chrome_process
+
+        # invalid job: the browser is kept
+        submit_job(self.spool_dir, input_html_path='nope.html')
+        with mock.patch('PythonChromiumHTML2PDF.spool_worker.print_to_pdf',
+                        side_effect=FileNotFoundError('nope.html')):
+            self.assertFalse(worker.process_job(worker.claim_job()))
+        self.assertIs(worker.chrome_process, chrome_process)
+        chrome_process.terminate.assert_not_called()
+
+        # browser error: the browser is restarted for the next job
+        submit_job(self.spool_dir, input_url='http://example.org')
+        with mock.patch('PythonChromiumHTML2PDF.spool_worker.print_to_pdf',
+                        side_effect=RuntimeError('CDP error')):
+            self.assertFalse(worker.process_job(worker.claim_job()))
+        self.assertIsNone(worker.chrome_process)
+        chrome_process.terminate.assert_called_once()
+
+    def test_run(self):
+        html_paths = [self._write_html(f'page_{i}.html') for i in range(3)]
+        job_ids = [submit_job(self.spool_dir, input_html_path=html_path)
+                   for html_path in html_paths]
+        failed_job_id = submit_job(
+            self.spool_dir,
+            input_html_path=os.path.join(self.temp_dir.name, 'nope.html'))
+
+        with SpoolWorker(self.spool_dir, worker_id='mock') as worker:
+            worker.run(exit_when_empty=True)
+
+        self.assertEqual(self._list('incoming'), [])
+        self.assertEqual(self._list('claimed'), [])
+        self.assertEqual(
+            self._list('done'),
+            sorted([f'{job_id}.json' for job_id in job_ids]
+                   + [f'{job_id}.pdf' for job_id in job_ids]))
+        self.assertEqual(self._list('failed'), [f'{failed_job_id}.json'])
+        for job_id in job_ids:
+            result = self._read_result('done', job_id)
+            self.assertTrue(os.path.isfile(result['output_pdf_path']))
+
+        result = self._read_result('failed', failed_job_id)
+        self.assertEqual(result['worker_id'], 'mock')
+        self.assertIn('FileNotFoundError', result['error'])
+
+    def test_run_several_processes(self):
+        html_paths = [self._write_html(f'page_{i}.html') for i in range(6)]
+        job_ids = [submit_job(self.spool_dir, input_html_path=html_path)
+                   for html_path in html_paths]
+
+        worker_code = (
+            'import sys\n'
+            'from PythonChromiumHTML2PDF.spool_worker import SpoolWorker\n'
+            'SpoolWorker(sys.argv[1], worker_id=sys.argv[2])'
+            '.run(exit_when_empty=True)\n')
+        worker_ids = ['worker_1', 'worker_2']
+        workers = [
+            subprocess.Popen([sys.executable, '-c', worker_code,  # nosec
+                              self.spool_dir, worker_id])
+            for worker_id in worker_ids]
+        try:
+            for worker in workers:
+                self.assertEqual(worker.wait(timeout=120), 0)
+        finally:
+            for worker in workers:
+                worker.kill()
+
+        self.assertEqual(self._list('incoming'), [])
+        self.assertEqual(self._list('claimed'), [])
+        self.assertEqual(self._list('failed'), [])
+        results = [self._read_result('done', job_id) for job_id in job_ids]
+        for result in results:
+            self.assertTrue(os.path.isfile(result['output_pdf_path']))
+        # each job ran once, and the work was shared
+        self.assertEqual(len(self._list('done')), 2 * len(job_ids))
+        self.assertEqual({result['worker_id'] for result in results},
+                         set(worker_ids))